@@ -6,46 +6,305 @@ by Yoonki Lee(UFID 61615545)
 for EGN6933 Exam III, 2024 Fall
 
 Due Date : 2024-12-01
+
+Requires numpy and numba (pip install -r requirements.txt)
 """
 
 import random
-from math import log2
+from functools import lru_cache
+from itertools import permutations
+
+import numpy as np
+from numba import njit, prange
+
+# log2(n) for n = 1..5040, indexed by n - 1
+_LOG2 = np.log2(np.arange(1, 5041))
+
+# count * log2(count) for count = 0..5040, with 0 * log2(0) = 0 so empty feedback patterns need no check
+_XLOG2X = np.arange(5041) * np.log2(np.maximum(np.arange(5041), 1))
+
+# Number of set bits of every 10-bit digit mask, i.e. how many digits the mask holds (1 KB, stays in L1)
+_POPCNT10 = np.array([bin(i).count("1") for i in range(1 << 10)], dtype=np.uint8)
+
+
+@njit(cache=True)
+def _entropy(n):
+    """
+    Entropy of n equally likely possibilities.
+
+    :param n: Number of possibilities
+    :return: float: log2(n) in bits, or 0 if there are none
+    """
+    if n == 0:
+        return 0.0
+    return _LOG2[n - 1]
+
+
+@njit(cache=True)
+def _information(counts, n):
+    """
+    Mutual information of a guess from its histogram of feedback codes.
+
+    I(X;Y) = log2(n) - sum(count / n * log2(count))
+
+    :param counts: Number of possibilities leading to each feedback code
+    :param n: Number of possibilities
+    :return: float: Mutual information in bits
+    """
+    if n == 0:
+        return 0.0
+    conditional_entropy = 0.0
+    for k in range(counts.shape[0]):
+        conditional_entropy += _XLOG2X[counts[k]]
+    return _entropy(n) - conditional_entropy / n
+
+
+@njit(cache=True)
+def _mutual_information(feedback_row, active, n_active):
+    """
+    Histogram the feedback codes of one guess and turn them into mutual information in a single pass.
+
+    :param feedback_row: Row of the feedback matrix for the guess
+    :param active: Boolean mask of the remaining possibilities
+    :param n_active: Number of remaining possibilities
+    :return: float: Mutual information in bits
+    """
+    counts = np.zeros(25, np.int32)
+    for j in range(active.shape[0]):
+        if active[j]:
+            counts[feedback_row[j]] += 1
+    return _information(counts, n_active)
+
+
+@njit(cache=True)
+def _narrow(feedback_row, active, code):
+    """
+    Histogram the feedback codes of one guess and drop the possibilities
+    that disagree with code, in one pass.
+
+    :param feedback_row: Row of the feedback matrix for the guess
+    :param active: Boolean mask of the remaining possibilities, updated in place
+    :param code: Feedback code (bulls * 5 + cows) the possibilities must match
+    :return: ndarray: histogram of feedback codes over the possibilities before the update
+    """
+    counts = np.zeros(25, np.int32)
+    for j in range(active.shape[0]):
+        if active[j]:
+            counts[feedback_row[j]] += 1
+            if feedback_row[j] != code:
+                active[j] = False
+    return counts
+
+
+@njit(parallel=True, cache=True)
+def _score_all(feedback_matrix, candidates, possible):
+    """
+    Mutual information of every candidate guess, in parallel over the candidates.
+
+    :param feedback_matrix: Feedback codes between every pair of numbers
+    :param candidates: Indices of the guesses to score
+    :param possible: Indices of the remaining possibilities
+    :return: ndarray: Mutual information in bits of each candidate
+    """
+    n = possible.shape[0]
+    infos = np.empty(candidates.shape[0])
+
+    for i in prange(candidates.shape[0]):
+        feedback_row = feedback_matrix[candidates[i]]
+        counts = np.zeros(25, np.int32)  # histogram of feedback codes (bulls * 5 + cows)
+        for j in possible:
+            counts[feedback_row[j]] += 1
+        infos[i] = _information(counts, n)
+
+    return infos
+
+
+@njit(cache=True)
+def _suggest(feedback_matrix, active):
+    """
+    Find the most informative next guess for the remaining possibilities.
+
+    Every number is scored, not only the remaining ones: a number that cannot be the secret
+    sometimes splits the possibilities better. Among equally informative guesses one that can
+    still be the secret is preferred.
+
+    :param feedback_matrix: Feedback codes between every pair of numbers
+    :param active: Boolean mask of the remaining possibilities (at least one)
+    :return: tuple: (index of the suggested guess, its mutual information in bits)
+    """
+    possible = np.flatnonzero(active)
+    n = possible.shape[0]
+    if n <= 2:  # guessing one of them is as informative as anything and may win
+        return possible[0], _entropy(n)
+
+    infos = _score_all(feedback_matrix, np.arange(feedback_matrix.shape[0]), possible)
+    max_info = infos.max()
+
+    best_guess = -1
+    for i in range(infos.shape[0]):
+        if infos[i] >= max_info - 1e-12:
+            if active[i]:
+                return i, infos[i]
+            if best_guess < 0:
+                best_guess = i
+    return best_guess, infos[best_guess]
+
+
+@njit(cache=True)
+def _turn_kernel(feedback_matrix, active, guess, code, suggest):
+    """
+    Compute all statistics of one turn.
+
+    One pass over the guess's feedback row builds the feedback histogram and narrows active in place;
+    the suggestion for the next turn then scans the narrowed possibilities.
+
+    :param feedback_matrix: Feedback codes between every pair of numbers
+    :param active: Boolean mask of the remaining possibilities, updated in place
+    :param guess: Index of the guess number
+    :param code: Feedback code (bulls * 5 + cows) of the guess against the secret
+    :param suggest: Whether to look for a next guess
+    :return: tuple: (previous entropy, mutual information, remaining possibilities, current entropy,
+                     suggested guess or -1, its mutual information)
+    """
+    counts = _narrow(feedback_matrix[guess], active, code)
+    n = counts.sum()
+
+    previous_entropy = _entropy(n)
+    mutual_info = _information(counts, n)
+    n_active = counts[code]
+    current_entropy = _entropy(n_active)
+
+    best_guess, best_info = -1, 0.0
+    if suggest and n_active > 0:
+        best_guess, best_info = _suggest(feedback_matrix, active)
+
+    return previous_entropy, mutual_info, n_active, current_entropy, best_guess, best_info
+
+
+def generate_all_numbers():
+    """
+    Generate all possible 4-digit numbers with no repeating digits.
+
+    1. First digit: 0-9 (10 choices)
+    2. Second digit: 0-9 except first (9 choices)
+    3. Third digit: remaining 8 choices
+    4. Fourth digit: remaining 7 choices
+
+    Total possibilities: 10 * 9 * 8 * 7 = 5040
+
+    Numbers are stored as one int8 matrix (one row per number, one column per digit)
+    together with a uint16 bitmask per number where bit d is set iff digit d appears.
+
+    :return: tuple: (combos, presence) arrays of shape (5040, 4) and (5040,)
+    """
+
+    # permutations() yields the tuples in lexicographic order;
+    # fill the matrix without an intermediate list
+    combos = np.fromiter(
+        (d for p in permutations(range(10), 4) for d in p), dtype=np.int8, count=5040 * 4
+    ).reshape(5040, 4)
+
+    presence = np.zeros(len(combos), dtype=np.uint16)
+    for d in range(4):  # set the bit of each digit
+        presence |= (1 << combos[:, d].astype(np.uint16)).astype(np.uint16)
+
+    return combos, presence
+
+
+def generate_feedback_matrix(combos, presence):
+    """
+    Precompute the feedback between every pair of numbers.
+
+    Entry [i, j] is the feedback code bulls * 5 + cows of guess i against secret j.
+    Feedback between two fixed numbers never changes, so it is built only once (5040 x 5040 bytes).
+
+    :param combos: int8 digit matrix of all numbers
+    :param presence: uint16 digit masks of all numbers
+    :return: ndarray: uint8 feedback codes of shape (5040, 5040)
+    """
+
+    # The sum of the cases where the digits of i and j are the same in each position
+    bulls = np.zeros((len(combos), len(combos)), dtype=np.uint8)
+    for d in range(4):
+        bulls += combos[:, None, d] == combos[None, :, d]
+
+    # (The number of digits shared by both presence masks) - bulls
+    common = _POPCNT10[presence[:, None] & presence[None, :]]
+
+    return bulls * 5 + (common - bulls)
+
+
+@lru_cache(maxsize=1)
+def _static_tables():
+    """
+    Build the tables shared by every game.
+
+    They are read-only, so repeated games reuse the same arrays
+    instead of rebuilding the feedback matrix.
+
+    :return: tuple: (combos, presence, feedback_matrix, numbers)
+    """
+
+    combos, presence = generate_all_numbers()
+    feedback_matrix = generate_feedback_matrix(combos, presence)
+    for table in (combos, presence, feedback_matrix):
+        table.flags.writeable = False
+    numbers = tuple("".join(map(str, combo)) for combo in combos)  # display strings, only for I/O
+
+    return combos, presence, feedback_matrix, numbers
 
 
 class BullsCows:
     def __init__(self):
-        self.possible_combinations = self.generate_all_numbers()
-        self.secret = random.choice(self.possible_combinations)
+        self.combos, self.presence, self.feedback_matrix, self.numbers = _static_tables()
+        self.active = np.ones(len(self.combos), dtype=bool)  # mask of the remaining possibilities
+        self.n_active = len(self.combos)
+        self.secret_idx = random.randrange(len(self.combos))
+        self.secret = self.numbers[self.secret_idx]
+        # self.secret_idx = self.parse_guess("3456"); self.secret = "3456"  # TEST
+        # feedback of every guess against the secret (the feedback matrix is symmetric)
+        self.secret_feedback = self.feedback_matrix[self.secret_idx]
         self.guesses = []
         self.initial_entropy = self.calculate_entropy()
-        # self.secret = "3456"  # TEST
 
-    def generate_all_numbers(self):
+    @property
+    def possible_combinations(self):
         """
-        Generate all possible 4-digit numbers with no repeating digits.
-
-        1. First digit: 0-9 (10 choices)
-        2. Second digit: 0-9 except first (9 choices)
-        3. Third digit: remaining 8 choices
-        4. Fourth digit: remaining 7 choices
+        Remaining possible numbers, for display.
 
-        Total possibilities: 10 * 9 * 8 * 7 = 5040
+        :return: list: remaining numbers as strings
+        """
+        return [self.numbers[i] for i in np.flatnonzero(self.active)]
 
-        :return: list: All valid 4-digit numbers as strings
+    def parse_guess(self, guess):
         """
+        Validate a guess and find its index in combos in a single pass.
+
+        Each digit sets one bit of a 10-bit mask, so a repeated digit is caught without building a set.
+        combos is in lexicographic order, so the index is the rank of the digits among the
+        unused ones, weighted by 9 * 8 * 7, 8 * 7, 7 and 1.
 
-        numbers = []  # empty list
+        :param guess: The guess number entered by the user
+        :return: int: Index of the guess in combos, or None if it is not 4 unique digits
+        """
 
-        for d1 in range(10):  # First digit: 0-9
-            for d2 in range(10):  # Second digit: 0-9
-                if d2 != d1:  # Skip if same as first digit
-                    for d3 in range(10):  # Third digit: 0-9
-                        if d3 != d1 and d3 != d2:  # Skip if same as previous digits
-                            for d4 in range(10):  # Fourth digit: 0-9
-                                if d4 != d1 and d4 != d2 and d4 != d3:  # Skip if same as previous digits
-                                    numbers.append(f"{d1}{d2}{d3}{d4}")
+        if len(guess) != 4:
+            return None
 
-        return numbers
+        mask = 0
+        index = 0
+        for c, weight in zip(guess, (504, 56, 7, 1)):
+            v = ord(c) - 48  # '0' -> 0, ..., '9' -> 9
+            if not 0 <= v <= 9:
+                return None
+            b = 1 << v
+            if mask & b:  # repeated digit
+                return None
+            # number of smaller digits that are still unused
+            index += (v - int(_POPCNT10[mask & (b - 1)])) * weight
+            mask |= b
+
+        return index
 
     def calculate_entropy(self):
         """
@@ -55,48 +314,17 @@ class BullsCows:
 
         :return: float: Entropy in bits
         """
-        n = len(self.possible_combinations)
-        if n == 0:
-            return 0
-        p = 1 / n  # Uniform distribution
-        return n * p * log2(1 / p)  # equals log2(n)
+        return _entropy(self.n_active)
 
     def get_feedback(self, guess):
         """
         Calculate bulls (correct position) and cows (wrong position) for a guess.
 
-        :param guess: The guess number entered by the user
+        :param guess: Index of the guess number in combos
         :return: tuple: (bulls, cows) counts
         """
 
-        # The sum of the cases where g and s are the same in each digit
-        bulls = sum(1 for g, s in zip(guess, self.secret) if g == s)
-        # print(bulls)
-
-        # (The sum of the cases where g is in secret number) - bulls
-        cows = sum(1 for g in guess if g in self.secret) - bulls
-        # print(cows)
-
-        return bulls, cows
-
-    def evaluate_possible_secret(self, guess, possible_secret):
-        """
-        Calculate bulls (correct position) and cows (wrong position) for a guess with possible secret.
-
-        :param guess: The guess number entered by the user
-        :param possible_secret: possible secret
-        :return: tuple: (bulls, cows) counts
-        """
-
-        # The sum of the cases where g and s are the same in each digit
-        bulls = sum(1 for g, s in zip(guess, possible_secret) if g == s)
-        # print(bulls)
-
-        # (The sum of the cases where g is in secret number) - bulls
-        cows = sum(1 for g in guess if g in possible_secret) - bulls
-        # print(cows)
-
-        return bulls, cows
+        return divmod(int(self.secret_feedback[guess]), 5)
 
     def calculate_mutual_information(self, guess):
         """
@@ -107,46 +335,29 @@ class BullsCows:
         - X is the secret number
         - Y is the feedback from the guess
 
-        :param guess: The guess number entered by the user
+        :param guess: Index of the guess number in combos
         :return: float: Mutual information in bits
         """
 
-        current_entropy = self.calculate_entropy()
-        if current_entropy == 0:
-            return 0
-
-        # Count how many possibilities lead to each feedback pattern(dictionary with key as tuple)
-        feedback_counts = {}
-        total = len(self.possible_combinations)
-
-        for possible_secret in self.possible_combinations:
-            feedback = self.evaluate_possible_secret(guess, possible_secret)
-            feedback_counts[feedback] = feedback_counts.get(feedback, 0) + 1
-
-        # Calculate expected conditional entropy H(X|Y)
-        conditional_entropy = 0
-        for count in feedback_counts.values():
-            if count > 0:
-                prob_feedback = count / total
-                entropy_given_feedback = log2(count)
-                conditional_entropy += prob_feedback * entropy_given_feedback
-
-        # Mutual information is the difference
-        return current_entropy - conditional_entropy
+        # Count the feedback patterns and H(X|Y) in one pass over the remaining possibilities
+        return _mutual_information(self.feedback_matrix[guess], self.active, self.n_active)
 
     def update_possibilities(self, guess, bulls, cows):
         """
         Update possible combinations based on feedback(bulls and cows).
 
-        :param guess: The guess number entered by the user
+        :param guess: Index of the guess number in combos
         :param bulls: The feedback result of bulls
         :param cows: The feedback result of cows
+        :return: ndarray: histogram of feedback codes of the guess over the possibilities
+                          before the update
         """
         # Leave only numbers with the same combination as the feedback result.
-        self.possible_combinations = [
-            possible_secret for possible_secret in self.possible_combinations
-            if self.evaluate_possible_secret(guess, possible_secret) == (bulls, cows)
-        ]
+        code = bulls * 5 + cows
+        counts = _narrow(self.feedback_matrix[guess], self.active, code)
+        self.n_active = int(counts[code])
+
+        return counts
 
     def suggest_guess(self):
         """
@@ -156,22 +367,12 @@ class BullsCows:
         :return: str: suggestion number
         """
 
-        if not self.possible_combinations:
+        if self.n_active == 0:
             return None
 
-        best_guess = None
-        max_info = -1
-
-        # candidates = self.possible_combinations
-        candidates = self.possible_combinations[:500]  # check only first 500 numbers for efficiency
+        best_guess, _ = _suggest(self.feedback_matrix, self.active)
 
-        for guess in candidates:
-            info = self.calculate_mutual_information(guess)
-            if info > max_info:
-                max_info = info
-                best_guess = guess
-
-        return best_guess
+        return self.numbers[best_guess]
 
     def make_guess(self, guess):
         """
@@ -181,21 +382,20 @@ class BullsCows:
         :return: dict: bulls, cows, entropy, mutual information and suggestion
         """
 
-        if len(guess) != 4 or len(set(guess)) != 4 or not guess.isnumeric():
+        guess_idx = self.parse_guess(guess)
+        if guess_idx is None:
             return "Invalid guess. Please enter 4 unique digits."
 
-        bulls, cows = self.get_feedback(guess)
+        bulls, cows = self.get_feedback(guess_idx)
         self.guesses.append((guess, bulls, cows))
 
-        # Calculate entropy and information metrics
-        previous_entropy = self.calculate_entropy()
-        mutual_info = self.calculate_mutual_information(guess)
-
-        self.update_possibilities(guess, bulls, cows)
-        current_entropy = self.calculate_entropy()
-
-        # Get suggestion for next guess
-        suggested_guess = self.suggest_guess() if bulls < 4 else None
+        # Entropy and information metrics, update of the possibilities
+        # and suggestion for next guess in one call
+        previous_entropy, mutual_info, n_active, current_entropy, best_guess, _ = _turn_kernel(
+            self.feedback_matrix, self.active, guess_idx, bulls * 5 + cows, bulls < 4
+        )
+        self.n_active = int(n_active)
+        suggested_guess = self.numbers[best_guess] if best_guess >= 0 else None
 
         return {
             'bulls': bulls,
@@ -203,7 +403,7 @@ class BullsCows:
             'previous_entropy': previous_entropy,
             'current_entropy': current_entropy,
             'mutual_information': mutual_info,
-            'remaining_possibilities': len(self.possible_combinations),
+            'remaining_possibilities': self.n_active,
             'suggested_next_guess': suggested_guess,
         }
 
@@ -223,7 +423,7 @@ def play_game():
     suggestion_yn = input("\nWant to get suggestion(hint)? (y/n)")
 
     # print initial information
-    print(f"\nInitial possibilities: {len(game.possible_combinations)}")
+    print(f"\nInitial possibilities: {game.n_active}")
     print(f"Initial entropy: {game.initial_entropy:.2f} bits")
 
     while True:
@@ -249,7 +449,7 @@ def play_game():
             suggested = result['suggested_next_guess']
             print(f"★Suggested next guess: {suggested}")
 
-            if len(game.possible_combinations) < 10:
+            if game.n_active < 10:
                 print(f"★Almore There!! {game.possible_combinations}")
 
         if result['bulls'] == 4: